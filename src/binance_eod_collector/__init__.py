@@ -8,6 +8,12 @@ from Binance Spot market for all trading pairs.
 __version__ = "0.1.0"
 __author__ = "Your Name"
 
-from .collector import BinanceEODCollector
-
 __all__ = ["BinanceEODCollector"]
+
+
+def __getattr__(name):
+    # Import the collector (pandas, binance client) only when first used
+    if name == "BinanceEODCollector":
+        from .collector import BinanceEODCollector
+        return BinanceEODCollector
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
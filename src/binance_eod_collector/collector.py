@@ -7,16 +7,33 @@ Uses hybrid approach:
 - CoinGecko API for market cap and circulating supply
 """
 
+import asyncio
 import logging
 import os
+import re
+import threading
 import time
-from datetime import datetime, timedelta
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
 from typing import List, Dict, Optional, Tuple
+import aiohttp
+import numpy as np
+import orjson
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from pandas.api.types import union_categoricals
 from binance.client import Client
 from binance.exceptions import BinanceAPIException
 
+from .runner import run_coroutine
+from .storage import cached_json, consolidate_store, load_store
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -25,49 +42,242 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+class TokenBucket:
+    """Thread-safe rate limiter over a rolling time window of request weights"""
+    
+    def __init__(self, capacity: int, period: float = 60.0):
+        """
+        Args:
+            capacity: Total weight allowed per period
+            period: Length of the rolling window in seconds
+        """
+        self.capacity = capacity
+        self.period = period
+        self._events = deque()  # (timestamp, weight)
+        self._used = 0
+        self._lock = threading.Lock()
+    
+    def _try_consume(self, weight: int) -> float:
+        """Consume `weight` if it fits and return 0, else return seconds to wait"""
+        with self._lock:
+            now = time.monotonic()
+            while self._events and now - self._events[0][0] >= self.period:
+                self._used -= self._events.popleft()[1]
+            
+            if self._used + weight <= self.capacity:
+                self._events.append((now, weight))
+                self._used += weight
+                return 0.0
+            
+            return self.period - (now - self._events[0][0])
+    
+    def acquire(self, weight: int = 1):
+        """Block until `weight` fits into the current window, then consume it"""
+        while (wait := self._try_consume(weight)) > 0:
+            time.sleep(wait)
+    
+    async def acquire_async(self, weight: int = 1):
+        """Like acquire, but waits without blocking the event loop"""
+        while (wait := self._try_consume(weight)) > 0:
+            await asyncio.sleep(wait)
+
+
 class BinanceEODCollector:
     """Collects EOD crypto market data from Binance Spot market with CoinGecko market cap data"""
     
+    BINANCE_BASE_URL = "https://api.binance.com/api/v3"
     COINGECKO_BASE_URL = "https://api.coingecko.com/api/v3"
     
+    # Common quote assets on Binance
+    QUOTE_ASSETS = ('USDT',)  # , 'BUSD', 'USDC', 'BTC', 'ETH', 'BNB', 'TRX', 'XRP', 'TUSD', 'PAX', 'EUR', 'GBP', 'AUD', 'TRY')
+    
+    # Longest quotes first so e.g. USDT wins over USD
+    _QUOTE_RE = re.compile(
+        r'^(.+?)(?:' + '|'.join(sorted(map(re.escape, QUOTE_ASSETS), key=len, reverse=True)) + r')$'
+    )
+    
+    # 24hr ticker field -> collector column
+    TICKER_COLUMNS = {
+        'symbol': 'symbol', 'openPrice': 'open', 'highPrice': 'high', 'lowPrice': 'low',
+        'lastPrice': 'close', 'volume': 'volume', 'quoteVolume': 'quote_volume',
+        'count': 'trades',
+    }
+    
+    # Partitioned Parquet store (one directory per symbol) inside data_dir
+    DATASET_NAME = "all_pairs_eod.parquet"
+    
+    # Every file in the store must share one schema, whatever the batch held.
+    # Prices and volumes stay float64 on disk: float32 keeps only 7 significant
+    # digits, which rounds BTC quote volumes by up to +-128. Downcast in memory
+    # (e.g. the ML matrices) instead.
+    STORE_DTYPES = {
+        'open': 'float64', 'high': 'float64', 'low': 'float64', 'close': 'float64',
+        'volume': 'float64', 'quote_volume': 'float64', 'trades': 'uint32',
+        'market_cap': 'float64', 'circulating_supply': 'float64',
+        'total_supply': 'float64', 'max_supply': 'float64',
+    }
+    
+    # zstd level for store files; 3 is fast to write and still compact
+    COMPRESSION_LEVEL = 3
+    
+    # Slow-changing reference data (symbol lists) is cached on disk this long
+    CACHE_TTL_SECONDS = 86400
+    
+    # Binance allows 1200 request weight per minute; stay below it
+    BINANCE_WEIGHT_PER_MINUTE = 1000
+    MAX_CONCURRENT_REQUESTS = 16
+    
+    # Binance caps a single klines call at 1000 rows
+    KLINES_PAGE_LIMIT = 1000
+    
+    # CoinGecko free tier allows 30 calls per minute; 429s are retried
+    COINGECKO_CALLS_PER_MINUTE = 30
+    COINGECKO_MAX_RETRIES = 3
+    
+    # CoinGecko allows up to 250 IDs per markets request with free tier
+    COINGECKO_BATCH_SIZE = 250
+    COINGECKO_MAX_WORKERS = 3
+    
+    # Historical collection appends to the store every this many rows
+    FLUSH_ROWS = 250_000
+    
+    # Daily updates add one file per symbol; compact a symbol once it has this many
+    CONSOLIDATE_MIN_FILES = 30
+    
     def __init__(self, data_dir: str = "data", api_key: Optional[str] = None, 
-                 api_secret: Optional[str] = None):
+                 api_secret: Optional[str] = None,
+                 cache_ttl_seconds: Optional[float] = None,
+                 session: Optional[requests.Session] = None):
         """
         Initialize the Binance data collector
         
         Args:
-            data_dir: Directory to store CSV files
+            data_dir: Directory to store data files
             api_key: Binance API key (optional for public data)
             api_secret: Binance API secret (optional for public data)
+            cache_ttl_seconds: How long cached symbol lists stay fresh
+                (default: CACHE_TTL_SECONDS); 0 always refetches
+            session: HTTP session to share between collectors (default: a new
+                one from make_session(), closed by close()); a shared session
+                is left open for its owner to close
         
         Note: API keys are not required for downloading market data
         """
         self.data_dir = data_dir
-        os.makedirs(data_dir, exist_ok=True)
+        self.dataset_path = os.path.join(data_dir, self.DATASET_NAME)
+        self.cache_dir = os.path.join(data_dir, ".cache")
+        self.cache_ttl_seconds = (self.CACHE_TTL_SECONDS if cache_ttl_seconds is None
+                                  else cache_ttl_seconds)
+        os.makedirs(self.cache_dir, exist_ok=True)
         
         # Initialize Binance client (no keys needed for public market data)
         self.client = Client(api_key, api_secret)
         
+        # Pooled keep-alive connections for CoinGecko and Binance REST calls
+        self._owns_session = session is None
+        self.session = self.make_session() if session is None else session
+        
+        # Shared across worker threads fetching klines
+        self._binance_limiter = TokenBucket(self.BINANCE_WEIGHT_PER_MINUTE)
+        self._cg_limiter = TokenBucket(self.COINGECKO_CALLS_PER_MINUTE)
+        
         # Cache for CoinGecko mappings
         self._coingecko_map = None
         self._coingecko_map_timestamp = None
         
+        # Binance symbol -> CoinGecko ID, rebuilt whenever the coins list is reloaded
+        self._binance_cg_map: Dict[str, str] = {}
+    
+    @staticmethod
+    def make_session() -> requests.Session:
+        """
+        Create a pooled keep-alive session configured for the collector
+        
+        Pass it to several collectors via session= to reuse connections
+        between them.
+        """
+        session = requests.Session()
+        session.headers.update({
+            'User-Agent': 'binance-eod-collector/0.1.0',
+            'Accept': 'application/json'
+        })
+        session.mount('https://', HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            # 429s are handled by _coingecko_get, which honours Retry-After
+            max_retries=Retry(total=5, backoff_factor=1,
+                              status_forcelist=[500, 502, 503, 504])
+        ))
+        return session
+    
+    def close(self):
+        """Close the pooled HTTP connections, unless the session was passed in"""
+        if self._owns_session:
+            self.session.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def _coingecko_get(self, url: str, params: Optional[Dict] = None) -> requests.Response:
+        """
+        GET a CoinGecko endpoint within the free-tier rate limit
+        
+        Throttled (429) responses are retried up to COINGECKO_MAX_RETRIES
+        times, waiting for Retry-After when given and otherwise backing off
+        1s, 2s, 4s, ...
+        
+        Args:
+            url: Endpoint URL
+            params: Query parameters
+        
+        Returns:
+            Successful response
+        
+        Raises:
+            requests.exceptions.RequestException: On errors or once retries
+                are exhausted
+        """
+        for attempt in range(self.COINGECKO_MAX_RETRIES + 1):
+            self._cg_limiter.acquire()
+            response = self.session.get(url, params=params)
+            if response.status_code != 429 or attempt == self.COINGECKO_MAX_RETRIES:
+                break
+            
+            retry_after = response.headers.get('Retry-After')
+            delay = int(retry_after) if retry_after and retry_after.isdigit() else 2 ** attempt
+            logger.warning(f"CoinGecko rate limit hit, retrying in {delay}s")
+            time.sleep(delay)
+        
+        response.raise_for_status()
+        return response
+    
+    def _cached_json(self, name: str, fetch):
+        """Return fetch() results cached as <cache_dir>/<name>.json.gz for cache_ttl_seconds"""
+        return cached_json(os.path.join(self.cache_dir, f"{name}.json.gz"),
+                           self.cache_ttl_seconds, fetch)
+    
     def get_all_spot_symbols(self) -> List[str]:
         """
-        Get all active Binance SPOT trading pairs
+        Get all active Binance SPOT trading pairs (cached on disk, 24 hours by default)
         
         Returns:
             List of trading pair symbols (e.g., ['BTCUSDT', 'ETHUSDT', ...])
         """
-        try:
+        def fetch():
             exchange_info = self.client.get_exchange_info()
             
             # Filter for SPOT trading pairs with TRADING status
-            spot_symbols = [
+            return [
                 s['symbol'] 
                 for s in exchange_info['symbols'] 
                 if s['status'] == 'TRADING'
             ]
+        
+        try:
+            spot_symbols = self._cached_json("spot_symbols", fetch)
             
             logger.info(f"Found {len(spot_symbols)} active SPOT trading pairs")
             return spot_symbols
@@ -79,24 +289,23 @@ class BinanceEODCollector:
     def get_coingecko_coins_list(self) -> Dict[str, str]:
         """
         Get CoinGecko coins list and create symbol-to-id mapping
-        Cache for 24 hours to avoid excessive API calls
+        Cached in memory and on disk (24 hours by default) to avoid excessive API calls
         
         Returns:
             Dictionary mapping symbol (uppercase) to CoinGecko ID
             Example: {'BTC': 'bitcoin', 'ETH': 'ethereum'}
         """
-        # Check cache validity (24 hours)
+        # Check in-memory cache validity
         if (self._coingecko_map is not None and 
             self._coingecko_map_timestamp is not None):
             age = datetime.now() - self._coingecko_map_timestamp
-            if age.total_seconds() < 86400:  # 24 hours
+            if age.total_seconds() < self.cache_ttl_seconds:
                 return self._coingecko_map
         
-        try:
+        def fetch():
             url = f"{self.COINGECKO_BASE_URL}/coins/list"
-            response = requests.get(url)
-            response.raise_for_status()
-            coins = response.json()
+            response = self._coingecko_get(url)
+            coins = orjson.loads(response.content)
             
             # Create mapping: symbol -> id
             symbol_map = {}
@@ -105,10 +314,22 @@ class BinanceEODCollector:
                 # If duplicate symbols exist, prefer the one with more common name
                 if symbol not in symbol_map:
                     symbol_map[symbol] = coin['id']
+            return symbol_map
+        
+        try:
+            symbol_map = self._cached_json("coingecko_symbol_map", fetch)
             
             self._coingecko_map = symbol_map
             self._coingecko_map_timestamp = datetime.now()
             
+            # Every base + quote pair, so mapping a trading pair is one lookup.
+            # Shorter quotes go first so the longest quote wins, as in _QUOTE_RE
+            self._binance_cg_map = {
+                base + quote: cg_id
+                for quote in sorted(self.QUOTE_ASSETS, key=len)
+                for base, cg_id in symbol_map.items()
+            }
+            
             logger.info(f"Loaded {len(symbol_map)} CoinGecko coin mappings")
             return symbol_map
             
@@ -126,20 +347,48 @@ class BinanceEODCollector:
         Returns:
             Base symbol (e.g., 'BTC', 'ETH') or None if cannot parse
         """
-        # Common quote assets on Binance
-        quote_assets = ['USDT']  # , 'BUSD', 'USDC', 'BTC', 'ETH', 'BNB', 'TRX', 'XRP', 'TUSD', 'PAX', 'EUR', 'GBP', 'AUD', 'TRY']
-        
-        # Try to match quote asset from the end
-        for quote in quote_assets:
-            if binance_symbol.endswith(quote):
-                base = binance_symbol[:-len(quote)]
-                if base:  # Make sure we have a base symbol
-                    return base
+        # One anchored match against all quote assets; the base must be non-empty
+        match = self._QUOTE_RE.match(binance_symbol)
+        if match:
+            return match.group(1)
         
         # If no match, log warning
         logger.warning(f"Could not extract base symbol from {binance_symbol}")
         return None
     
+    def extract_base_symbols(self, binance_symbols: List[str]) -> pd.Series:
+        """
+        Vectorised extract_base_symbol over many trading pairs
+        
+        Args:
+            binance_symbols: Binance symbols like ['BTCUSDT', 'ETHUSDT']
+        
+        Returns:
+            Series of base symbols indexed by Binance symbol (None if cannot parse)
+        """
+        symbols = pd.Series(binance_symbols, index=binance_symbols, dtype=object)
+        bases = symbols.str.extract(self._QUOTE_RE, expand=False)
+        
+        parsed = bases.notna()
+        if not parsed.all():
+            unparsed = bases.index[~parsed].tolist()
+            logger.warning(f"Could not extract base symbol from {len(unparsed)} symbols: {unparsed[:10]}")
+        return bases.where(parsed, None)
+    
+    def map_binance_to_coingecko_batch(self, binance_symbols: List[str]) -> pd.Series:
+        """
+        Vectorised map_binance_to_coingecko over many trading pairs
+        
+        Args:
+            binance_symbols: Binance symbols like ['BTCUSDT', 'ETHUSDT']
+        
+        Returns:
+            Series of CoinGecko IDs indexed by Binance symbol (None if not found)
+        """
+        self.get_coingecko_coins_list()
+        cg_ids = pd.Series(binance_symbols, index=binance_symbols, dtype=object).map(self._binance_cg_map)
+        return cg_ids.where(cg_ids.notna(), None)
+    
     def map_binance_to_coingecko(self, binance_symbol: str) -> Optional[str]:
         """
         Map Binance symbol to CoinGecko ID
@@ -150,12 +399,9 @@ class BinanceEODCollector:
         Returns:
             CoinGecko ID (e.g., 'bitcoin') or None if not found
         """
-        base_symbol = self.extract_base_symbol(binance_symbol)
-        if not base_symbol:
-            return None
-        
-        coingecko_map = self.get_coingecko_coins_list()
-        return coingecko_map.get(base_symbol)
+        # Reloads the coins list (and rebuilds the pair map) once the TTL expires
+        self.get_coingecko_coins_list()
+        return self._binance_cg_map.get(binance_symbol)
     
     def get_coingecko_market_data(self, coingecko_ids: List[str]) -> Dict[str, Dict]:
         """
@@ -171,46 +417,51 @@ class BinanceEODCollector:
             return {}
         
         market_data = {}
-        
-        # CoinGecko allows up to 250 IDs per request with free tier
-        batch_size = 250
-        
-        for i in range(0, len(coingecko_ids), batch_size):
-            batch = coingecko_ids[i:i + batch_size]
-            
-            try:
-                url = f"{self.COINGECKO_BASE_URL}/coins/markets"
-                params = {
-                    'vs_currency': 'usd',
-                    'ids': ','.join(batch),
-                    'order': 'market_cap_desc',
-                    'per_page': batch_size,
-                    'page': 1,
-                    'sparkline': False
-                }
-                
-                response = requests.get(url, params=params)
-                response.raise_for_status()
-                data = response.json()
-                
-                for coin in data:
-                    market_data[coin['id']] = {
-                        'market_cap': coin.get('market_cap'),
-                        'circulating_supply': coin.get('circulating_supply'),
-                        'total_supply': coin.get('total_supply'),
-                        'max_supply': coin.get('max_supply')
-                    }
-                
-                # Rate limiting for CoinGecko free tier: 30 calls/min
-                time.sleep(2)
-                
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Error fetching CoinGecko market data for batch {i}: {e}")
-                continue
+        batch_size = self.COINGECKO_BATCH_SIZE
+        batches = [coingecko_ids[i:i + batch_size]
+                   for i in range(0, len(coingecko_ids), batch_size)]
+        
+        # A few batches in flight at once over the pooled session; the
+        # shared limiter in _coingecko_get keeps them within the rate limit
+        with ThreadPoolExecutor(max_workers=self.COINGECKO_MAX_WORKERS) as executor:
+            futures = {executor.submit(self._fetch_cg_batch, batch): i
+                       for i, batch in enumerate(batches)}
+            
+            for future in as_completed(futures):
+                try:
+                    market_data.update(future.result())
+                except requests.exceptions.RequestException as e:
+                    logger.error(f"Error fetching CoinGecko market data for batch "
+                                 f"{futures[future] * batch_size}: {e}")
         
         logger.info(f"Fetched market data for {len(market_data)} coins from CoinGecko")
         return market_data
     
+    def _fetch_cg_batch(self, batch: List[str]) -> Dict[str, Dict]:
+        """Fetch market data for one batch of CoinGecko IDs"""
+        url = f"{self.COINGECKO_BASE_URL}/coins/markets"
+        params = {
+            'vs_currency': 'usd',
+            'ids': ','.join(batch),
+            'order': 'market_cap_desc',
+            'per_page': self.COINGECKO_BATCH_SIZE,
+            'page': 1,
+            'sparkline': False
+        }
+        
+        response = self._coingecko_get(url, params=params)
+        data = orjson.loads(response.content)
+        
+        return {
+            coin['id']: {
+                'market_cap': coin.get('market_cap'),
+                'circulating_supply': coin.get('circulating_supply'),
+                'total_supply': coin.get('total_supply'),
+                'max_supply': coin.get('max_supply')
+            }
+            for coin in data
+        }
+    
     def get_historical_klines(self, symbol: str, days: int = 365) -> pd.DataFrame:
         """
         Fetch historical daily klines (OHLCV) data for a symbol
@@ -220,55 +471,136 @@ class BinanceEODCollector:
             days: Number of days of historical data
             
         Returns:
-            DataFrame with columns: date, open, high, low, close, volume, 
-                                   quote_volume, trades, taker_buy_base, taker_buy_quote
+            DataFrame with columns: date, open, high, low, close, volume,
+                                   quote_volume, trades, symbol
         """
-        try:
-            # Calculate start time
-            end_time = datetime.now()
-            start_time = end_time - timedelta(days=days)
-            
-            # Get daily klines
-            klines = self.client.get_historical_klines(
-                symbol=symbol,
-                interval=Client.KLINE_INTERVAL_1DAY,
-                start_str=start_time.strftime('%Y-%m-%d'),
-                end_str=end_time.strftime('%Y-%m-%d')
-            )
-            
-            if not klines:
-                logger.warning(f"No data returned for {symbol}")
-                return pd.DataFrame()
-            
-            # Convert to DataFrame
-            df = pd.DataFrame(klines, columns=[
-                'timestamp', 'open', 'high', 'low', 'close', 'volume',
-                'close_time', 'quote_volume', 'trades', 'taker_buy_base',
-                'taker_buy_quote', 'ignore'
-            ])
-            
-            # Convert timestamp to date
-            df['date'] = pd.to_datetime(df['timestamp'], unit='ms').dt.date
-            
-            # Convert price and volume columns to float
-            price_cols = ['open', 'high', 'low', 'close', 'volume', 'quote_volume']
-            for col in price_cols:
-                df[col] = df[col].astype(float)
-            
-            # Select and reorder columns
-            df = df[['date', 'open', 'high', 'low', 'close', 'volume', 'quote_volume', 'trades']]
-            df['symbol'] = symbol
-            
-            logger.info(f"Downloaded {len(df)} days of data for {symbol}")
-            return df
-            
-        except BinanceAPIException as e:
-            logger.error(f"Error fetching data for {symbol}: {e}")
+        # Synchronous wrapper over iter_klines, which owns the paging
+        async def fetch():
+            async for _, df in self.iter_klines([symbol], days):
+                return df
+        
+        return run_coroutine(fetch())
+    
+    @staticmethod
+    def _klines_to_frame(klines: List[list], symbol: str) -> pd.DataFrame:
+        """Convert raw Binance klines rows into the collector's DataFrame layout"""
+        if not klines:
+            logger.warning(f"No data returned for {symbol}")
             return pd.DataFrame()
+        
+        # Kline layout: [open_time, open, high, low, close, volume, close_time,
+        #                quote_volume, trades, taker_buy_base, taker_buy_quote, ignore]
+        arr = np.array(klines, dtype=object)
+        timestamps = arr[:, 0].astype(np.int64)
+        
+        # Cast all price and volume columns in a single pass, at the store's
+        # float64 precision
+        price_cols = ['open', 'high', 'low', 'close', 'volume', 'quote_volume']
+        numeric = arr[:, [1, 2, 3, 4, 5, 7]].astype(np.float64)
+        
+        df = pd.DataFrame({
+            'date': pd.to_datetime(timestamps, unit='ms').date,
+            **{col: numeric[:, j] for j, col in enumerate(price_cols)},
+            'trades': pd.to_numeric(arr[:, 8].astype(np.int64), downcast='unsigned'),
+            'symbol': symbol,
+        })
+        df['symbol'] = df['symbol'].astype('category')
+        
+        logger.info(f"Downloaded {len(df)} days of data for {symbol}")
+        return df
+    
+    def _kline_windows(self, days: int) -> List[Dict]:
+        """
+        Split the most recent `days` daily klines into request windows
+        
+        One window (no explicit range) covers up to KLINES_PAGE_LIMIT days;
+        longer ranges get fixed startTime/endTime windows, newest first, so
+        they can be requested concurrently.
+        """
+        if days <= self.KLINES_PAGE_LIMIT:
+            return [{'limit': days}]
+        
+        day_ms = 86_400_000
+        now_ms = int(time.time() * 1000)
+        today_ms = now_ms - now_ms % day_ms  # open time of today's kline
+        
+        windows = []
+        for offset in range(0, days, self.KLINES_PAGE_LIMIT):
+            limit = min(self.KLINES_PAGE_LIMIT, days - offset)
+            end_time = today_ms - offset * day_ms
+            windows.append({
+                'startTime': end_time - (limit - 1) * day_ms,
+                'endTime': end_time,
+                'limit': limit,
+            })
+        return windows
+    
+    async def _fetch_klines_window(self, session: aiohttp.ClientSession, symbol: str,
+                                   window: Dict) -> List[list]:
+        """Fetch one window of daily klines, waiting on the shared weight limiter first"""
+        # Daily klines requests cost 2 weight on Binance
+        await self._binance_limiter.acquire_async(weight=2)
+        async with session.get(
+            f"{self.BINANCE_BASE_URL}/klines",
+            params={'symbol': symbol, 'interval': '1d', **window},
+            timeout=aiohttp.ClientTimeout(total=30)
+        ) as response:
+            response.raise_for_status()
+            return orjson.loads(await response.read())
+    
+    async def _fetch_klines(self, session: aiohttp.ClientSession, symbol: str,
+                            days: int) -> pd.DataFrame:
+        """
+        Fetch daily klines for one symbol from the Binance REST API
+        
+        Ranges longer than KLINES_PAGE_LIMIT days are split into windows that
+        are requested concurrently; windows before the symbol was listed come
+        back empty. Any error is logged and returns an empty DataFrame so one bad
+        response does not abort the whole run.
+        """
+        windows = self._kline_windows(days)
+        pages = await asyncio.gather(
+            *(self._fetch_klines_window(session, symbol, window) for window in windows),
+            return_exceptions=True
+        )
+        
+        for page in pages:
+            if isinstance(page, Exception):
+                logger.error(f"Error fetching data for {symbol}: {page}")
+                return pd.DataFrame()
+            if isinstance(page, BaseException):
+                raise page  # e.g. CancelledError
+        
+        try:
+            # Windows are newest first; concatenate them oldest first
+            klines = [kline for page in reversed(pages) for kline in page]
+            return self._klines_to_frame(klines, symbol)
         except Exception as e:
-            logger.error(f"Unexpected error for {symbol}: {e}")
+            logger.error(f"Error fetching data for {symbol}: {e}")
             return pd.DataFrame()
     
+    async def iter_klines(self, symbols: List[str], days: int):
+        """
+        Fetch daily klines for many symbols concurrently
+        
+        Args:
+            symbols: Trading pair symbols
+            days: Number of days of historical data
+        
+        Yields:
+            (symbol, DataFrame) in completion order
+        """
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_REQUESTS)
+        connector = aiohttp.TCPConnector(limit=self.MAX_CONCURRENT_REQUESTS)
+        
+        async with aiohttp.ClientSession(connector=connector) as session:
+            async def fetch(symbol):
+                async with semaphore:
+                    return symbol, await self._fetch_klines(session, symbol, days)
+            
+            for next_done in asyncio.as_completed([fetch(symbol) for symbol in symbols]):
+                yield await next_done
+    
     def get_current_day_ticker(self, symbols: List[str]) -> pd.DataFrame:
         """
         Get current 24hr ticker data for all symbols (more efficient for daily updates)
@@ -280,39 +612,36 @@ class BinanceEODCollector:
             DataFrame with current day data
         """
         try:
-            # Get 24hr ticker for all symbols at once
-            tickers = self.client.get_ticker()
+            # Get 24hr ticker for all symbols at once: a raw REST call over the
+            # pooled session, decoded with orjson (costs 80 weight on Binance)
+            self._binance_limiter.acquire(weight=80)
+            response = self.session.get(f"{self.BINANCE_BASE_URL}/ticker/24hr", timeout=30)
+            response.raise_for_status()
+            tickers = orjson.loads(response.content)
             
-            # Filter for requested symbols
-            symbol_set = set(symbols)
-            filtered_tickers = [t for t in tickers if t['symbol'] in symbol_set]
+            # Filter the requested symbols before building the frame, and
+            # take only the ticker fields we keep
+            wanted = set(symbols)
+            records = [ticker for ticker in tickers if ticker['symbol'] in wanted]
             
-            if not filtered_tickers:
+            if not records:
                 logger.warning("No ticker data returned")
                 return pd.DataFrame()
             
-            # Convert to DataFrame
-            df = pd.DataFrame(filtered_tickers)
-            
-            # Add date and convert types
-            df['date'] = datetime.now().date()
-            
-            # Select relevant columns and rename
-            df = df[['date', 'symbol', 'openPrice', 'highPrice', 'lowPrice', 
-                    'lastPrice', 'volume', 'quoteVolume', 'count']]
+            df = pd.DataFrame.from_records(records, columns=list(self.TICKER_COLUMNS))
+            df = df.rename(columns=self.TICKER_COLUMNS)
+            df.insert(0, 'date', datetime.now().date())
             
-            df.columns = ['date', 'symbol', 'open', 'high', 'low', 
-                         'close', 'volume', 'quote_volume', 'trades']
-            
-            # Convert to float
+            # Convert to the store's numeric types
             price_cols = ['open', 'high', 'low', 'close', 'volume', 'quote_volume']
-            for col in price_cols:
-                df[col] = df[col].astype(float)
+            df[price_cols] = df[price_cols].astype(np.float64)
+            df['trades'] = pd.to_numeric(df['trades'], downcast='unsigned')
+            df['symbol'] = df['symbol'].astype('category')
             
             logger.info(f"Downloaded current data for {len(df)} symbols")
             return df
             
-        except BinanceAPIException as e:
+        except requests.exceptions.RequestException as e:
             logger.error(f"Error fetching current ticker data: {e}")
             return pd.DataFrame()
     
@@ -354,36 +683,103 @@ class BinanceEODCollector:
         coingecko_ids = list(symbol_to_coingecko.values())
         market_data = self.get_coingecko_market_data(coingecko_ids)
         
-        # Enrich DataFrame
-        df['market_cap'] = None
-        df['circulating_supply'] = None
-        df['total_supply'] = None
-        df['max_supply'] = None
-        
-        for idx, row in df.iterrows():
-            symbol = row['symbol']
-            if symbol in symbol_to_coingecko:
-                cg_id = symbol_to_coingecko[symbol]
-                if cg_id in market_data:
-                    df.at[idx, 'market_cap'] = market_data[cg_id]['market_cap']
-                    df.at[idx, 'circulating_supply'] = market_data[cg_id]['circulating_supply']
-                    df.at[idx, 'total_supply'] = market_data[cg_id]['total_supply']
-                    df.at[idx, 'max_supply'] = market_data[cg_id]['max_supply']
+        # Enrich DataFrame with one vectorized join: symbol -> cg_id -> market data
+        market_cols = ['market_cap', 'circulating_supply', 'total_supply', 'max_supply']
+        # Typed float64 so missing values are NaN rather than object None
+        md_df = pd.DataFrame.from_dict(market_data, orient='index', columns=market_cols,
+                                       dtype=np.float64)
+        mapping_df = pd.DataFrame({
+            'symbol': list(symbol_to_coingecko),
+            'cg_id': list(symbol_to_coingecko.values())
+        })
+        df = (
+            df.drop(columns=market_cols, errors='ignore')
+            .merge(mapping_df, on='symbol', how='left')
+            .merge(md_df, left_on='cg_id', right_index=True, how='left')
+            .drop(columns='cg_id')
+        )
+        # The merge falls back to object symbols; prices are already float64
+        df['symbol'] = df['symbol'].astype('category')
         
         # Filter out rows where we couldn't get CoinGecko data
-        df_filtered = df[df['market_cap'].notna()].copy()
+        has_market_cap = df['market_cap'].notna()
+        df_filtered = df.loc[has_market_cap]
         
-        additional_skipped = set(df[df['market_cap'].isna()]['symbol'].unique())
-        skipped_symbols.extend(additional_skipped)
+        # Unmapped symbols show up here again; dedupe keeping first-seen order
+        additional_skipped = df.loc[~has_market_cap, 'symbol'].unique()
+        skipped_symbols = list(dict.fromkeys([*skipped_symbols, *additional_skipped]))
         
         logger.info(f"Successfully enriched {len(df_filtered)} records with CoinGecko data")
         
         return df_filtered, skipped_symbols
     
+    def save_to_parquet(self, df: pd.DataFrame):
+        """
+        Append data to the Parquet store, partitioned by symbol
+        
+        Only new files are written; existing data is never read back or
+        rewritten. Duplicate (date, symbol) rows are resolved by load_data,
+        which keeps the most recently written one.
+        
+        Args:
+            df: DataFrame to save
+        """
+        if df.empty:
+            logger.warning("Empty DataFrame, nothing to save")
+            return
+        
+        df = df.astype({col: dtype for col, dtype in self.STORE_DTYPES.items()
+                        if col in df.columns})
+        
+        # Time-ordered file names keep partition files in write order; pyarrow
+        # refuses more than 1024 partitions per write unless told otherwise
+        ds.write_dataset(
+            pa.Table.from_pandas(df, preserve_index=False),
+            self.dataset_path,
+            format='parquet',
+            partitioning=['symbol'],
+            partitioning_flavor='hive',
+            existing_data_behavior='overwrite_or_ignore',
+            basename_template=f"part-{time.time_ns()}-{{i}}.parquet",
+            max_partitions=max(df['symbol'].nunique(), 1),
+            file_options=ds.ParquetFileFormat().make_write_options(
+                compression='zstd', compression_level=self.COMPRESSION_LEVEL
+            )
+        )
+        logger.info(f"Appended {len(df)} rows to {self.dataset_path}")
+    
+    def load_data(self, columns: Optional[List[str]] = None,
+                  symbols: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Load collected data from the Parquet store
+        
+        Args:
+            columns: Columns to load in addition to date and symbol (default: all)
+            symbols: Only load these symbols (default: all)
+        
+        Returns:
+            DataFrame deduplicated on (date, symbol), sorted by symbol and date
+        """
+        return load_store(self.dataset_path, columns, symbols)
+    
+    def consolidate(self, min_files: int = 2):
+        """
+        Compact the Parquet store into one deduplicated file per symbol
+        
+        Args:
+            min_files: Only rewrite symbols with at least this many files
+        """
+        consolidate_store(self.dataset_path, min_files, compression='zstd',
+                          compression_level=self.COMPRESSION_LEVEL)
+    
     def save_to_csv(self, df: pd.DataFrame, filename: str = "all_pairs_eod.csv", 
                     mode: str = 'w'):
         """
-        Save data to CSV file
+        Save data to CSV file (human-readable export; the primary store is Parquet)
+        
+        Append mode only adds rows to the end of the file; it does not read
+        back or deduplicate what is already there. Export from load_data()
+        with mode 'w' for a deduplicated file.
         
         Args:
             df: DataFrame to save
@@ -395,23 +791,50 @@ class BinanceEODCollector:
             return
         
         filepath = os.path.join(self.data_dir, filename)
+        append = mode == 'a' and os.path.exists(filepath)
         
-        if mode == 'a' and os.path.exists(filepath):
-            # Append and remove duplicates
-            existing_df = pd.read_csv(filepath)
-            existing_df['date'] = pd.to_datetime(existing_df['date']).dt.date
-            
-            combined_df = pd.concat([existing_df, df], ignore_index=True)
-            combined_df = combined_df.drop_duplicates(subset=['date', 'symbol'], keep='last')
-            combined_df = combined_df.sort_values(['symbol', 'date'])
-            combined_df.to_csv(filepath, index=False)
-            logger.info(f"Appended data to {filepath}")
+        # Same layout as DataFrame.to_csv: date and symbol first, unquoted
+        df = df[['date', 'symbol'] + [c for c in df.columns if c not in ('date', 'symbol')]]
+        
+        if self._csv_needs_quoting(df):
+            df.to_csv(filepath, mode='a' if append else 'w', header=not append, index=False)
         else:
-            df.to_csv(filepath, index=False)
-            logger.info(f"Saved data to {filepath}")
+            # pyarrow's C++ writer is much faster than DataFrame.to_csv but
+            # formats floats its own way (8.3e+11, 2). Floats are rendered with
+            # numpy's str first, as to_csv does, so the file is byte-identical
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            for i, col in enumerate(df.columns):
+                if pd.api.types.is_float_dtype(df[col]):
+                    values = df[col].to_numpy()
+                    table = table.set_column(
+                        i, col, pa.array(values.astype(str), mask=np.isnan(values))
+                    )
+            
+            # pyarrow always quotes its own header, so it is written here
+            with open(filepath, 'ab' if append else 'wb') as f:
+                if not append:
+                    f.write((','.join(df.columns) + '\n').encode())
+                pacsv.write_csv(table, f, write_options=pacsv.WriteOptions(
+                    include_header=False, quoting_style='none'))
+        
+        logger.info(f"{'Appended' if append else 'Saved'} data to {filepath}")
+    
+    @staticmethod
+    def _csv_needs_quoting(df: pd.DataFrame) -> bool:
+        """Whether any string value contains a CSV delimiter, quote or newline"""
+        for col in df.columns:
+            values = df[col]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.cat.categories.to_series()
+            if pd.api.types.infer_dtype(values, skipna=True) != 'string':
+                continue
+            if values.str.contains(r'[,"\r\n]', regex=True).any():
+                return True
+        return False
     
     def collect_historical_data(self, days: int = 365, max_symbols: Optional[int] = None,
-                               symbols_filter: Optional[List[str]] = None):
+                               symbols_filter: Optional[List[str]] = None,
+                               return_data: bool = False) -> Optional[pd.DataFrame]:
         """
         Collect historical data for all or filtered Binance Spot pairs
         Enriches with CoinGecko market cap and supply data
@@ -420,6 +843,12 @@ class BinanceEODCollector:
             days: Number of days of historical data
             max_symbols: Maximum number of symbols to collect (for testing)
             symbols_filter: List of specific symbols to collect (e.g., ['BTCUSDT', 'ETHUSDT'])
+            return_data: Also keep the enriched rows in memory and return them;
+                leave off for large collections, which only need the store
+        
+        Returns:
+            The enriched rows written by this run, sorted by symbol and date,
+            if return_data is set, otherwise None
         """
         logger.info("Starting historical data collection...")
         
@@ -434,61 +863,95 @@ class BinanceEODCollector:
                 symbols = symbols[:max_symbols]
                 logger.info(f"Limited to first {max_symbols} symbols for testing")
         
+        return run_coroutine(self._collect_historical_data(symbols, days, return_data))
+    
+    async def _collect_historical_data(self, symbols: List[str], days: int,
+                                       return_data: bool = False) -> Optional[pd.DataFrame]:
         all_data = []
+        collected = [] if return_data else None
+        buffered_rows = 0
         failed_symbols = []
-        skipped_symbols_coingecko = []
         
-        for i, symbol in enumerate(symbols, 1):
-            logger.info(f"Processing {i}/{len(symbols)}: {symbol}")
-            
-            df = self.get_historical_klines(symbol, days=days)
+        # Symbols with no CoinGecko ID would be dropped at enrichment anyway;
+        # skip them before spending a Binance request on each
+        cg_ids = self.map_binance_to_coingecko_batch(symbols)
+        skipped_symbols_coingecko = cg_ids.index[cg_ids.isna()].tolist()
+        if skipped_symbols_coingecko:
+            logger.info(f"Skipping {len(skipped_symbols_coingecko)} symbols not on CoinGecko")
+        symbols = cg_ids.index[cg_ids.notna()].tolist()
+        
+        i = 0
+        async for symbol, df in self.iter_klines(symbols, days):
+            i += 1
+            logger.info(f"Processed {i}/{len(symbols)}: {symbol}")
             
             if not df.empty:
                 all_data.append(df)
+                buffered_rows += len(df)
             else:
                 failed_symbols.append(symbol)
             
-            # Rate limiting: Binance has weight limits
-            # Most requests have weight 1-2, limit is 1200/min
-            # Sleep 0.5s between requests to be safe
-            time.sleep(0.5)
-            
-            # Save and enrich intermediate results every 50 symbols
-            if i % 50 == 0 and all_data:
-                logger.info(f"Processing intermediate batch and enriching with CoinGecko data...")
-                combined_df = pd.concat(all_data, ignore_index=True)
-                
-                # Enrich with CoinGecko data
-                enriched_df, skipped = self.enrich_with_coingecko_data(combined_df)
-                skipped_symbols_coingecko.extend(skipped)
-                
-                if not enriched_df.empty:
-                    self.save_to_csv(enriched_df, mode='a')
-                
-                all_data = []  # Clear batch
-        
-        # Process final batch
+            # Append to the store in row-bounded batches so memory stays
+            # flat however many symbols are collected; fetches keep running
+            # while the batch is enriched and written
+            if buffered_rows >= self.FLUSH_ROWS:
+                skipped_symbols_coingecko.extend(
+                    await asyncio.to_thread(self._flush_batch, all_data, collected)
+                )
+                buffered_rows = 0
+        
         if all_data:
-            logger.info("Processing final batch and enriching with CoinGecko data...")
-            combined_df = pd.concat(all_data, ignore_index=True)
-            
-            # Enrich with CoinGecko data
-            enriched_df, skipped = self.enrich_with_coingecko_data(combined_df)
-            skipped_symbols_coingecko.extend(skipped)
-            
-            if not enriched_df.empty:
-                enriched_df = enriched_df.sort_values(['symbol', 'date'])
-                self.save_to_csv(enriched_df, mode='a')
+            skipped_symbols_coingecko.extend(self._flush_batch(all_data, collected))
+        
+        # Deduplicate once at the end rather than on every batch
+        self.consolidate()
         
         logger.info(f"Historical data collection complete!")
         logger.info(f"Successfully collected from Binance: {len(symbols) - len(failed_symbols)} symbols")
         logger.info(f"Failed to fetch from Binance: {len(failed_symbols)} symbols")
-        logger.info(f"Skipped (not on CoinGecko): {len(set(skipped_symbols_coingecko))} symbols")
+        skipped_symbols_coingecko = list(dict.fromkeys(skipped_symbols_coingecko))
+        logger.info(f"Skipped (not on CoinGecko): {len(skipped_symbols_coingecko)} symbols")
         
         if failed_symbols:
             logger.warning(f"Failed Binance symbols: {failed_symbols[:10]}...")
         if skipped_symbols_coingecko:
-            logger.warning(f"Skipped CoinGecko symbols: {list(set(skipped_symbols_coingecko))[:10]}...")
+            logger.warning(f"Skipped CoinGecko symbols: {skipped_symbols_coingecko[:10]}...")
+        
+        if collected is None:
+            return None
+        if not collected:
+            return pd.DataFrame()
+        df = pd.concat(collected, ignore_index=True, copy=False)
+        df['symbol'] = df['symbol'].astype('category')
+        return df.sort_values(['symbol', 'date'], ignore_index=True)
+    
+    def _flush_batch(self, all_data: List[pd.DataFrame],
+                     collected: Optional[List[pd.DataFrame]] = None) -> List[str]:
+        """
+        Enrich buffered kline frames and append them to the store
+        
+        Args:
+            all_data: Buffered per-symbol frames; emptied on return
+            collected: If given, the enriched frame is also appended to it
+        
+        Returns:
+            Symbols skipped because they are not on CoinGecko
+        """
+        logger.info(f"Enriching {len(all_data)} symbols with CoinGecko data...")
+        # Each frame carries a one-category symbol column; union the
+        # categories so the combined column stays categorical
+        symbol_col = union_categoricals([df['symbol'] for df in all_data])
+        combined_df = pd.concat(all_data, ignore_index=True, copy=False)
+        combined_df['symbol'] = symbol_col
+        all_data.clear()
+        
+        enriched_df, skipped = self.enrich_with_coingecko_data(combined_df)
+        if not enriched_df.empty:
+            # No sort here: partitions are sorted once by consolidate()
+            self.save_to_parquet(enriched_df)
+            if collected is not None:
+                collected.append(enriched_df)
+        return skipped
     
     def collect_daily_update(self, symbols_filter: Optional[List[str]] = None):
         """
@@ -514,10 +977,11 @@ class BinanceEODCollector:
             enriched_df, skipped = self.enrich_with_coingecko_data(df)
             
             if not enriched_df.empty:
-                self.save_to_csv(enriched_df, mode='a')
+                self.save_to_parquet(enriched_df)
+                self.consolidate(self.CONSOLIDATE_MIN_FILES)
                 logger.info(f"Daily update complete for {len(enriched_df)} symbols")
                 if skipped:
-                    logger.info(f"Skipped {len(set(skipped))} symbols (not on CoinGecko)")
+                    logger.info(f"Skipped {len(skipped)} symbols (not on CoinGecko)")
             else:
                 logger.error("No symbols could be enriched with CoinGecko data")
         else:
@@ -530,25 +994,26 @@ class BinanceEODCollector:
         Returns:
             Dictionary with summary statistics
         """
-        filepath = os.path.join(self.data_dir, "all_pairs_eod.csv")
+        # Only the columns the stats need are read from the Parquet store
+        df = self.load_data(columns=['volume'])
         
-        if not os.path.exists(filepath):
+        if df.empty:
             return {"error": "No data file found"}
         
-        df = pd.read_csv(filepath)
-        df['date'] = pd.to_datetime(df['date'])
+        # One grouped pass for both per-symbol aggregates; dates stay as
+        # datetime.date objects since only their min/max is needed
+        per_symbol = df.groupby('symbol', observed=True)['volume'].agg(['sum', 'size'])
         
         stats = {
             "total_records": len(df),
-            "unique_symbols": df['symbol'].nunique(),
+            "unique_symbols": len(per_symbol),
             "date_range": {
                 "start": df['date'].min().strftime('%Y-%m-%d'),
                 "end": df['date'].max().strftime('%Y-%m-%d')
             },
-            "top_10_symbols_by_volume": df.groupby('symbol')['volume'].sum()
-                                          .sort_values(ascending=False).head(10).to_dict(),
+            "top_10_symbols_by_volume": per_symbol['sum'].nlargest(10).to_dict(),
             "data_completeness": {
-                "symbols_with_data": df.groupby('symbol').size().describe().to_dict()
+                "symbols_with_data": per_symbol['size'].describe().to_dict()
             }
         }
         
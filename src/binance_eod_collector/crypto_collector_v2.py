@@ -8,13 +8,20 @@ Features:
 - Automatic symbol mapping between Binance and CoinGecko
 """
 
+import asyncio
+import aiohttp
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
 import time
-from datetime import datetime, timedelta
 import logging
 from pathlib import Path
-import json
+import orjson
+
+from .runner import run_coroutine
+from .storage import cached_json, consolidate_store, load_store
 
 # Setup logging
 logging.basicConfig(
@@ -25,32 +32,82 @@ logger = logging.getLogger(__name__)
 
 
 class CryptoDataCollector:
+    # Base assets whose first CoinGecko symbol match is missing or ambiguous
+    SPECIAL_MAPPINGS = {
+        'BNB': 'binancecoin',
+        'WBTC': 'wrapped-bitcoin',
+        'WETH': 'weth',
+        'SHIB': 'shiba-inu',
+        'DOGE': 'dogecoin',
+        'MATIC': 'matic-network',
+    }
+    
+    # Transient HTTP statuses retried with exponential backoff
+    RETRY_STATUSES = [429, 500, 502, 503, 504]
+    MAX_RETRIES = 5
+    
+    # Exchange info and the CoinGecko coins list are cached on disk this long
+    CACHE_TTL_SECONDS = 86400
+    
+    COLUMN_ORDER = ['date', 'symbol', 'base_asset', 'coingecko_id',
+                    'price', 'volume', 'market_cap', 'timestamp']
+    
+    # Daily updates add one file per symbol; compact a symbol once it has this many
+    CONSOLIDATE_MIN_FILES = 30
+    
     def __init__(self, output_dir='data'):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
+        self.data_path = self.output_dir / 'crypto_data.parquet'
         
         self.binance_base_url = 'https://api.binance.com/api/v3'
         self.coingecko_base_url = 'https://api.coingecko.com/api/v3'
         
+        # Pooled keep-alive connections for the synchronous Binance/CoinGecko calls
+        self.session = requests.Session()
+        self.session.headers.update({
+            'Accept-Encoding': 'gzip, deflate',
+            'User-Agent': 'binance-eod-collector/0.1.0'
+        })
+        self.session.mount('https://', HTTPAdapter(
+            pool_connections=32,
+            pool_maxsize=32,
+            max_retries=Retry(total=5, backoff_factor=1.0,
+                              status_forcelist=self.RETRY_STATUSES,
+                              respect_retry_after_header=True)
+        ))
+        
         # Rate limiting
         self.coingecko_calls = []
         self.max_calls_per_minute = 30  # CoinGecko free tier limit
+        self._coingecko_lock = asyncio.Lock()
+        
+        # Reference data cached on disk, shared by every collector and run
+        self.cache_dir = self.output_dir / '.cache'
+        self.cache_dir.mkdir(exist_ok=True)
         
         # Cache file for symbol mappings
         self.mapping_file = self.output_dir / 'symbol_mapping.json'
         self.symbol_mapping = self.load_symbol_mapping()
+        self._lookup = None
+        self._lookup_source = None
         
     def load_symbol_mapping(self):
         """Load cached symbol mapping if exists"""
         if self.mapping_file.exists():
-            with open(self.mapping_file, 'r') as f:
-                return json.load(f)
+            with open(self.mapping_file, 'rb') as f:
+                return orjson.loads(f.read())
         return {}
     
     def save_symbol_mapping(self):
         """Save symbol mapping to cache"""
-        with open(self.mapping_file, 'w') as f:
-            json.dump(self.symbol_mapping, f, indent=2)
+        with open(self.mapping_file, 'wb') as f:
+            f.write(orjson.dumps(self.symbol_mapping, option=orjson.OPT_INDENT_2))
+    
+    def _cached_json(self, name, fetch):
+        """Return fetch() results cached in the .cache directory for CACHE_TTL_SECONDS"""
+        return cached_json(self.cache_dir / f'{name}.json.gz',
+                           self.CACHE_TTL_SECONDS, fetch)
     
     def rate_limit_coingecko(self):
         """Ensure we don't exceed CoinGecko rate limits (30 calls/min)"""
@@ -66,14 +123,28 @@ class CryptoDataCollector:
         
         self.coingecko_calls.append(now)
     
+    async def rate_limit_coingecko_async(self):
+        """Async variant of rate_limit_coingecko, safe to share between concurrent tasks"""
+        async with self._coingecko_lock:
+            now = time.time()
+            self.coingecko_calls = [t for t in self.coingecko_calls if now - t < 60]
+            
+            if len(self.coingecko_calls) >= self.max_calls_per_minute:
+                sleep_time = 60 - (now - self.coingecko_calls[0]) + 1
+                logger.info(f"Rate limit reached. Sleeping for {sleep_time:.1f} seconds...")
+                await asyncio.sleep(sleep_time)
+                self.coingecko_calls = []
+            
+            self.coingecko_calls.append(time.time())
+    
     def get_binance_spot_pairs(self):
-        """Get all USDT trading pairs from Binance"""
+        """Get all USDT trading pairs from Binance (cached on disk for CACHE_TTL_SECONDS)"""
         logger.info("Fetching Binance Spot pairs...")
         
-        try:
-            response = requests.get(f'{self.binance_base_url}/exchangeInfo', timeout=10)
+        def fetch():
+            response = self.session.get(f'{self.binance_base_url}/exchangeInfo', timeout=10)
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
             
             # Filter for active USDT pairs
             usdt_pairs = []
@@ -84,6 +155,10 @@ class CryptoDataCollector:
                         'symbol': symbol_info['symbol'],
                         'base_asset': symbol_info['baseAsset']
                     })
+            return usdt_pairs
+        
+        try:
+            usdt_pairs = self._cached_json('binance_usdt_pairs', fetch)
             
             logger.info(f"Found {len(usdt_pairs)} active USDT trading pairs")
             return usdt_pairs
@@ -93,30 +168,31 @@ class CryptoDataCollector:
             return []
     
     def get_coingecko_coins_list(self):
-        """Get list of all coins from CoinGecko for mapping"""
+        """Get list of all coins from CoinGecko for mapping (cached on disk for CACHE_TTL_SECONDS)"""
         logger.info("Fetching CoinGecko coins list...")
-        self.rate_limit_coingecko()
         
-        try:
-            response = requests.get(
+        def fetch():
+            self.rate_limit_coingecko()
+            response = self.session.get(
                 f'{self.coingecko_base_url}/coins/list',
                 timeout=10
             )
             response.raise_for_status()
-            coins = response.json()
+            coins = orjson.loads(response.content)
             
-            # Create mapping: symbol -> id
-            symbol_to_id = {}
-            for coin in coins:
-                symbol = coin['symbol'].upper()
-                coin_id = coin['id']
-                
-                # Store first match, but prefer exact matches
-                if symbol not in symbol_to_id:
-                    symbol_to_id[symbol] = coin_id
-                # Prefer matches where symbol matches name
-                elif coin['name'].lower() == symbol.lower():
-                    symbol_to_id[symbol] = coin_id
+            # Create mapping: symbol -> id. The first coin listed for a symbol
+            # wins unless a coin whose name matches the symbol exists. dict()
+            # keeps the last value per key, so feed the other coins in reverse
+            # and the exact name matches after them.
+            coins = [(coin['symbol'].upper(), coin['id'],
+                      coin['name'].lower() == coin['symbol'].lower()) for coin in coins]
+            return dict(
+                [(symbol, coin_id) for symbol, coin_id, exact in reversed(coins) if not exact]
+                + [(symbol, coin_id) for symbol, coin_id, exact in coins if exact]
+            )
+        
+        try:
+            symbol_to_id = self._cached_json('coingecko_symbol_map', fetch)
             
             logger.info(f"Loaded {len(symbol_to_id)} coin mappings from CoinGecko")
             return symbol_to_id
@@ -125,60 +201,69 @@ class CryptoDataCollector:
             logger.error(f"Error fetching CoinGecko coins list: {e}")
             return {}
     
+    def get_coingecko_lookup(self, symbol_to_id):
+        """
+        Merge cached, CoinGecko and special-case mappings into one dict
+        
+        Precedence: cached mapping, then CoinGecko's list, then special cases.
+        The merged dict is rebuilt only when a different symbol_to_id is passed.
+        """
+        if self._lookup_source is not symbol_to_id:
+            self._lookup = {**self.SPECIAL_MAPPINGS, **symbol_to_id, **self.symbol_mapping}
+            self._lookup_source = symbol_to_id
+        return self._lookup
+    
     def map_binance_to_coingecko(self, base_asset, symbol_to_id):
         """Map Binance base asset to CoinGecko ID"""
-        # Check cache first
-        if base_asset in self.symbol_mapping:
-            return self.symbol_mapping[base_asset]
-        
-        # Try direct mapping
-        if base_asset in symbol_to_id:
-            coingecko_id = symbol_to_id[base_asset]
-            self.symbol_mapping[base_asset] = coingecko_id
-            return coingecko_id
-        
-        # Handle special cases
-        special_mappings = {
-            'BNB': 'binancecoin',
-            'WBTC': 'wrapped-bitcoin',
-            'WETH': 'weth',
-            'SHIB': 'shiba-inu',
-            'DOGE': 'dogecoin',
-            'MATIC': 'matic-network',
-        }
-        
-        if base_asset in special_mappings:
-            coingecko_id = special_mappings[base_asset]
+        coingecko_id = self.get_coingecko_lookup(symbol_to_id).get(base_asset)
+        if coingecko_id:
             self.symbol_mapping[base_asset] = coingecko_id
-            return coingecko_id
+        return coingecko_id
+    
+    async def _request_with_retry(self, session, url, params):
+        """
+        GET a CoinGecko endpoint, retrying transient errors with bounded backoff
         
-        return None
+        Waits for the Retry-After header when the server sends one, otherwise
+        min(2**attempt, 60) seconds. Non-retryable errors, and the last failed
+        attempt, raise aiohttp.ClientResponseError.
+        """
+        for attempt in range(self.MAX_RETRIES + 1):
+            await self.rate_limit_coingecko_async()
+            async with session.get(
+                url, params=params, timeout=aiohttp.ClientTimeout(total=30)
+            ) as response:
+                if response.status not in self.RETRY_STATUSES or attempt == self.MAX_RETRIES:
+                    response.raise_for_status()
+                    return orjson.loads(await response.read())
+                retry_after = response.headers.get('Retry-After', '')
+            
+            delay = float(retry_after) if retry_after.isdigit() else min(2 ** attempt, 60)
+            logger.warning(f"HTTP {response.status} from CoinGecko. Retrying in {delay:.0f}s...")
+            await asyncio.sleep(delay)
     
-    def get_historical_data(self, coingecko_id, days=365):
+    async def get_historical_data(self, session, coingecko_id, days=365):
         """
         Fetch historical price, volume, and market cap from CoinGecko
         
         Args:
+            session: Open aiohttp.ClientSession used for the request
             coingecko_id: CoinGecko coin ID (e.g., 'bitcoin')
             days: Number of days of history (max 365 for free tier)
         
         Returns:
             DataFrame with columns: timestamp, date, price, volume, market_cap
         """
-        self.rate_limit_coingecko()
-        
         try:
-            response = requests.get(
+            data = await self._request_with_retry(
+                session,
                 f'{self.coingecko_base_url}/coins/{coingecko_id}/market_chart',
                 params={
                     'vs_currency': 'usd',
                     'days': days,
                     'interval': 'daily'
-                },
-                timeout=30
+                }
             )
-            response.raise_for_status()
-            data = response.json()
             
             # Extract data
             prices = data.get('prices', [])
@@ -189,34 +274,58 @@ class CryptoDataCollector:
                 logger.warning(f"No data returned for {coingecko_id}")
                 return pd.DataFrame()
             
-            # Convert to DataFrame
-            df_list = []
-            for price_data, mcap_data, vol_data in zip(prices, market_caps, volumes):
-                timestamp = price_data[0]
-                df_list.append({
-                    'timestamp': timestamp,
-                    'date': datetime.fromtimestamp(timestamp / 1000).strftime('%Y-%m-%d'),
-                    'price': price_data[1],
-                    'market_cap': mcap_data[1],
-                    'volume': vol_data[1]
-                })
+            # Each series is a list of [timestamp_ms, value]; convert them
+            # column-wise in one shot, kept at float64 like the main
+            # collector's store. Dates stay datetime64 at midnight UTC
+            # rather than strings
+            n = min(len(prices), len(market_caps), len(volumes))
+            p = np.asarray(prices[:n], dtype=np.float64)
+            m = np.asarray(market_caps[:n], dtype=np.float64)
+            v = np.asarray(volumes[:n], dtype=np.float64)
+            timestamps = p[:, 0].astype(np.int64)
+            
+            df = pd.DataFrame({
+                'timestamp': timestamps,
+                'date': pd.to_datetime(timestamps, unit='ms').normalize(),
+                'price': p[:, 1],
+                'market_cap': m[:, 1],
+                'volume': v[:, 1]
+            })
             
-            df = pd.DataFrame(df_list)
             logger.info(f"Fetched {len(df)} days of data for {coingecko_id}")
             return df
             
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 429:
-                logger.warning(f"Rate limited by CoinGecko. Waiting 60 seconds...")
-                time.sleep(60)
-                return self.get_historical_data(coingecko_id, days)
-            else:
-                logger.error(f"HTTP error fetching data for {coingecko_id}: {e}")
-                return pd.DataFrame()
+        except aiohttp.ClientResponseError as e:
+            logger.error(f"HTTP error fetching data for {coingecko_id}: {e}")
+            return pd.DataFrame()
         except Exception as e:
             logger.error(f"Error fetching data for {coingecko_id}: {e}")
             return pd.DataFrame()
     
+    async def iter_historical_data(self, jobs, days=365):
+        """
+        Fetch historical data for many coins concurrently
+        
+        Args:
+            jobs: Iterable of (symbol, base_asset, coingecko_id) tuples
+            days: Number of days of history
+        
+        Yields:
+            ((symbol, base_asset, coingecko_id), DataFrame) in completion order
+        """
+        # Fresh lock per event loop; at most max_calls_per_minute requests in flight
+        self._coingecko_lock = asyncio.Lock()
+        semaphore = asyncio.Semaphore(self.max_calls_per_minute)
+        
+        connector = aiohttp.TCPConnector(limit=64)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            async def fetch(job):
+                async with semaphore:
+                    return job, await self.get_historical_data(session, job[2], days)
+            
+            for next_done in asyncio.as_completed([fetch(job) for job in jobs]):
+                yield await next_done
+    
     def collect_historical_data(self, days=365):
         """
         Collect historical data for all Binance USDT pairs
@@ -224,6 +333,9 @@ class CryptoDataCollector:
         Args:
             days: Number of days of history (max 365 for free tier)
         """
+        run_coroutine(self._collect_historical_data(days))
+    
+    async def _collect_historical_data(self, days):
         logger.info(f"Starting historical data collection for {days} days...")
         
         # Get Binance pairs
@@ -235,27 +347,35 @@ class CryptoDataCollector:
         # Get CoinGecko mapping
         symbol_to_id = self.get_coingecko_coins_list()
         
+        # Map every pair up front in one vectorised lookup so the fetches
+        # can run concurrently
+        pairs_df = pd.DataFrame(binance_pairs)
+        pairs_df['coingecko_id'] = pairs_df['base_asset'].map(self.get_coingecko_lookup(symbol_to_id))
+        mapped = pairs_df['coingecko_id'].notna()
+        
+        failed_pairs = []
+        for symbol, base_asset in zip(pairs_df.loc[~mapped, 'symbol'], pairs_df.loc[~mapped, 'base_asset']):
+            logger.warning(f"Could not map {base_asset} to CoinGecko ID. Skipping {symbol}.")
+            failed_pairs.append(symbol)
+        
+        pairs_df = pairs_df[mapped]
+        self.symbol_mapping.update(zip(pairs_df['base_asset'], pairs_df['coingecko_id']))
+        jobs = list(pairs_df[['symbol', 'base_asset', 'coingecko_id']].itertuples(index=False, name=None))
+        
         # Collect data for each pair
         all_data = []
         successful_pairs = 0
-        failed_pairs = []
         
-        for i, pair_info in enumerate(binance_pairs, 1):
-            symbol = pair_info['symbol']
-            base_asset = pair_info['base_asset']
-            
-            logger.info(f"Processing {i}/{len(binance_pairs)}: {symbol} ({base_asset})")
-            
-            # Map to CoinGecko ID
-            coingecko_id = self.map_binance_to_coingecko(base_asset, symbol_to_id)
-            
-            if not coingecko_id:
-                logger.warning(f"Could not map {base_asset} to CoinGecko ID. Skipping {symbol}.")
-                failed_pairs.append(symbol)
-                continue
-            
-            # Fetch historical data
-            df = self.get_historical_data(coingecko_id, days)
+        # Checkpoints are appended to a single file as pairs complete, so
+        # each frame is written once rather than re-concatenated every time
+        checkpoint_file = self.output_dir / 'checkpoint_crypto_data.csv'
+        checkpoint_file.unlink(missing_ok=True)
+        checkpointed = 0
+        
+        i = 0
+        async for (symbol, base_asset, coingecko_id), df in self.iter_historical_data(jobs, days):
+            i += 1
+            logger.info(f"Processed {i}/{len(jobs)}: {symbol} ({base_asset})")
             
             if df.empty:
                 logger.warning(f"No data retrieved for {symbol}. Skipping.")
@@ -272,7 +392,8 @@ class CryptoDataCollector:
             
             # Save progress every 50 pairs
             if successful_pairs % 50 == 0:
-                self.save_data(all_data, f'checkpoint_{successful_pairs}')
+                self.append_checkpoint(all_data[checkpointed:], checkpoint_file)
+                checkpointed = len(all_data)
                 logger.info(f"Checkpoint saved: {successful_pairs} pairs processed")
         
         # Save symbol mapping
@@ -280,7 +401,8 @@ class CryptoDataCollector:
         
         # Save final data
         if all_data:
-            self.save_data(all_data, 'historical')
+            self.save_data(all_data)
+            self.consolidate()
             logger.info(f"Historical data collection complete!")
             logger.info(f"Successful: {successful_pairs}/{len(binance_pairs)} pairs")
             if failed_pairs:
@@ -292,33 +414,31 @@ class CryptoDataCollector:
         """
         Update data with the latest day's data for all pairs
         """
+        run_coroutine(self._collect_daily_update())
+    
+    async def _collect_daily_update(self):
         logger.info("Starting daily data update...")
         
-        # Load existing data
-        data_file = self.output_dir / 'crypto_data.csv'
-        if not data_file.exists():
-            logger.error("No existing data file found. Run historical collection first.")
+        # Only the pair columns are needed to know what to update
+        if not self.data_path.exists():
+            logger.error("No existing data found. Run historical collection first.")
             return
         
-        existing_df = pd.read_csv(data_file)
-        logger.info(f"Loaded existing data: {len(existing_df)} rows")
-        
-        # Get unique pairs
-        pairs = existing_df[['symbol', 'base_asset', 'coingecko_id']].drop_duplicates()
+        pairs = pd.read_parquet(
+            self.data_path, columns=['symbol', 'base_asset', 'coingecko_id']
+        ).drop_duplicates()
+        logger.info(f"Loaded {len(pairs)} existing pairs")
+        jobs = list(zip(pairs['symbol'], pairs['base_asset'], pairs['coingecko_id']))
         
         # Collect latest data for each pair
         new_data = []
         successful_updates = 0
         
-        for i, row in pairs.iterrows():
-            symbol = row['symbol']
-            base_asset = row['base_asset']
-            coingecko_id = row['coingecko_id']
-            
-            logger.info(f"Updating {i+1}/{len(pairs)}: {symbol}")
-            
-            # Fetch last 2 days (to ensure we get today's data)
-            df = self.get_historical_data(coingecko_id, days=2)
+        # Fetch last 2 days (to ensure we get today's data)
+        i = 0
+        async for (symbol, base_asset, coingecko_id), df in self.iter_historical_data(jobs, days=2):
+            i += 1
+            logger.info(f"Updated {i}/{len(pairs)}: {symbol}")
             
             if df.empty:
                 logger.warning(f"No data retrieved for {symbol}")
@@ -336,52 +456,71 @@ class CryptoDataCollector:
             successful_updates += 1
         
         if new_data:
-            # Combine new data
-            new_df = pd.concat(new_data, ignore_index=True)
-            
-            # Remove duplicates (in case data already exists)
-            combined_df = pd.concat([existing_df, new_df], ignore_index=True)
-            combined_df = combined_df.drop_duplicates(subset=['date', 'symbol'], keep='last')
-            combined_df = combined_df.sort_values(['symbol', 'date'])
-            
-            # Save
-            output_file = self.output_dir / 'crypto_data.csv'
-            combined_df.to_csv(output_file, index=False)
+            # Rows already in the store are superseded at read time by load_data
+            self.save_data(new_data)
+            self.consolidate(self.CONSOLIDATE_MIN_FILES)
             
             logger.info(f"Daily update complete!")
             logger.info(f"Updated: {successful_updates}/{len(pairs)} pairs")
-            logger.info(f"Total rows: {len(combined_df)}")
-            logger.info(f"New rows added: {len(combined_df) - len(existing_df)}")
         else:
             logger.error("No new data collected!")
     
-    def save_data(self, data_list, prefix=''):
-        """Save collected data to CSV"""
+    def append_checkpoint(self, data_list, checkpoint_file):
+        """Append newly collected frames to the checkpoint CSV"""
+        for df in data_list:
+            df[self.COLUMN_ORDER].to_csv(
+                checkpoint_file,
+                mode='a',
+                header=not checkpoint_file.exists(),
+                index=False
+            )
+    
+    def save_data(self, data_list):
+        """
+        Append collected data to the Parquet store, partitioned by symbol
+        
+        Existing files are never read back or rewritten; duplicate
+        (date, symbol) rows are resolved by load_data.
+        """
         if not data_list:
             logger.warning("No data to save")
             return
         
-        # Combine all dataframes
-        df = pd.concat(data_list, ignore_index=True)
-        
-        # Sort by symbol and date
-        df = df.sort_values(['symbol', 'date'])
+        # Combine all dataframes in one concat
+        df = pd.concat(data_list, ignore_index=True, copy=False)
         
         # Reorder columns
-        column_order = ['date', 'symbol', 'base_asset', 'coingecko_id', 
-                       'price', 'volume', 'market_cap', 'timestamp']
-        df = df[column_order]
-        
-        # Save to CSV
-        filename = f"{prefix}_crypto_data.csv" if prefix else "crypto_data.csv"
-        output_file = self.output_dir / filename
-        df.to_csv(output_file, index=False)
-        
-        logger.info(f"Data saved to {output_file}")
-        logger.info(f"Total rows: {len(df)}")
+        df = df[self.COLUMN_ORDER]
+        
+        # Time-ordered file names keep partition files in write order; pyarrow
+        # refuses more than 1024 partitions per write unless told otherwise
+        df.to_parquet(
+            self.data_path,
+            engine='pyarrow',
+            compression='zstd',
+            partition_cols=['symbol'],
+            index=False,
+            basename_template=f"part-{time.time_ns()}-{{i}}.parquet",
+            max_partitions=max(df['symbol'].nunique(), 1)
+        )
+        
+        logger.info(f"Data appended to {self.data_path}")
+        logger.info(f"Rows written: {len(df)}")
         logger.info(f"Date range: {df['date'].min()} to {df['date'].max()}")
         logger.info(f"Unique pairs: {df['symbol'].nunique()}")
-
+    
+    def consolidate(self, min_files=2):
+        """Compact the Parquet store into one deduplicated file per symbol"""
+        consolidate_store(self.data_path, min_files, compression='zstd')
+    
+    def load_data(self, columns=None, symbols=None):
+        """
+        Load collected data in COLUMN_ORDER (see storage.load_store for arguments)
+        """
+        df = load_store(self.data_path, columns, symbols)
+        if df.columns.empty:
+            return pd.DataFrame(columns=self.COLUMN_ORDER)
+        return df[[c for c in self.COLUMN_ORDER if c in df.columns]]
 
 def main():
     """Main entry point"""
@@ -3,24 +3,25 @@ Main entry point for Binance EOD Data Collector
 """
 
 import argparse
+import functools
 import json
-import os
 import sys
 from pathlib import Path
-from binance_eod_collector import BinanceEODCollector
 
 
+@functools.lru_cache(maxsize=1)
 def load_config():
-    """Load configuration from config.json if it exists"""
-    config_path = Path("../../config.json")
-    if config_path.exists():
-        with open(config_path, 'r') as f:
+    """Load configuration from config.json at the project root if it exists"""
+    try:
+        with open(Path(__file__).parent.parent.parent / "config.json", 'r') as f:
             return json.load(f)
-    return {}
+    except FileNotFoundError:
+        return {}
 
 
-def main():
-    """Main function for historical data collection"""
+@functools.lru_cache(maxsize=None)
+def _build_main_parser():
+    """Build the argument parser for historical collection (built once)"""
     parser = argparse.ArgumentParser(
         description="Collect historical EOD data from Binance Spot market"
     )
@@ -60,8 +61,66 @@ def main():
         default=None,
         help='Binance API secret (optional for public data)'
     )
+    parser.add_argument(
+        '--mode',
+        choices=['fresh', 'update', 'auto'],
+        default='auto',
+        help='fresh: collect history, update: add latest data, '
+             'auto: collect if no data exists, otherwise ask (or update when '
+             'not run from a terminal) (default: auto)'
+    )
+    parser.add_argument(
+        '--csv',
+        action='store_true',
+        help='Also export the collected data to all_pairs_eod.csv in the data directory'
+    )
+    return parser
+
+
+@functools.lru_cache(maxsize=None)
+def _build_update_parser():
+    """Build the argument parser for daily updates (built once)"""
+    parser = argparse.ArgumentParser(
+        description="Update with today's EOD data from Binance Spot market"
+    )
+    parser.add_argument(
+        '--data-dir',
+        type=str,
+        default='data',
+        help='Directory containing data files (default: data)'
+    )
+    parser.add_argument(
+        '--symbols',
+        type=str,
+        nargs='+',
+        help='Specific symbols to update (e.g., BTCUSDT ETHUSDT)'
+    )
+    parser.add_argument(
+        '--csv',
+        action='store_true',
+        help='Also export the collected data to all_pairs_eod.csv in the data directory'
+    )
+    parser.add_argument(
+        '--api-key',
+        type=str,
+        default=None,
+        help='Binance API key (optional for public data)'
+    )
+    parser.add_argument(
+        '--api-secret',
+        type=str,
+        default=None,
+        help='Binance API secret (optional for public data)'
+    )
+    return parser
+
+
+def main():
+    """Main function for historical data collection"""
+    args = _build_main_parser().parse_args()
     
-    args = parser.parse_args()
+    # Imported after argument parsing so --help and usage errors stay fast
+    from binance_eod_collector import BinanceEODCollector
     
     # Load config
     config = load_config()
@@ -79,30 +138,46 @@ def main():
     )
     
     # Check if data already exists
-    data_file = os.path.join(data_dir, "all_pairs_eod.csv")
+    try:
+        Path(collector.dataset_path).stat()
+        has_data = True
+    except FileNotFoundError:
+        has_data = False
     
-    if not os.path.exists(data_file):
-        print("No existing data found. Starting historical data collection...")
+    # In auto mode only ask when someone is at the terminal; headless runs
+    # (cron, CI, containers) update existing data instead of blocking
+    mode = args.mode
+    if mode == 'auto':
+        if not has_data:
+            print("No existing data found. Starting historical data collection...")
+            mode = 'fresh'
+        elif sys.stdin.isatty():
+            print("Existing data found.")
+            response = input("Do you want to:\n1. Re-collect historical data (replaces stored rows for the same dates)\n2. Update with latest data\nChoice (1/2): ")
+            
+            if response == '1':
+                mode = 'fresh'
+            elif response == '2':
+                mode = 'update'
+            else:
+                print("Invalid choice. Exiting.")
+                sys.exit(1)
+        else:
+            print("Existing data found. Updating with latest data...")
+            mode = 'update'
+    
+    if mode == 'fresh':
         collector.collect_historical_data(
             days=args.days,
             max_symbols=args.max_symbols,
             symbols_filter=args.symbols
         )
     else:
-        print("Existing data found.")
-        response = input("Do you want to:\n1. Collect fresh historical data (overwrites)\n2. Update with latest data\nChoice (1/2): ")
-        
-        if response == '1':
-            collector.collect_historical_data(
-                days=args.days,
-                max_symbols=args.max_symbols,
-                symbols_filter=args.symbols
-            )
-        elif response == '2':
-            collector.collect_daily_update(symbols_filter=args.symbols)
-        else:
-            print("Invalid choice. Exiting.")
-            sys.exit(1)
+        collector.collect_daily_update(symbols_filter=args.symbols)
+    
+    # Parquet is the primary store; CSV is an optional export
+    if args.csv:
+        collector.save_to_csv(collector.load_data())
     
     # Print summary
     print("\n" + "="*60)
@@ -114,35 +189,10 @@ def main():
 
 def update():
     """Update function for daily data collection"""
-    parser = argparse.ArgumentParser(
-        description="Update with today's EOD data from Binance Spot market"
-    )
-    parser.add_argument(
-        '--data-dir',
-        type=str,
-        default='data',
-        help='Directory containing data files (default: data)'
-    )
-    parser.add_argument(
-        '--symbols',
-        type=str,
-        nargs='+',
-        help='Specific symbols to update (e.g., BTCUSDT ETHUSDT)'
-    )
-    parser.add_argument(
-        '--api-key',
-        type=str,
-        default=None,
-        help='Binance API key (optional for public data)'
-    )
-    parser.add_argument(
-        '--api-secret',
-        type=str,
-        default=None,
-        help='Binance API secret (optional for public data)'
-    )
+    args = _build_update_parser().parse_args()
     
-    args = parser.parse_args()
+    # Imported after argument parsing so --help and usage errors stay fast
+    from binance_eod_collector import BinanceEODCollector
     
     # Load config
     config = load_config()
@@ -162,6 +212,9 @@ def update():
     # Perform daily update
     collector.collect_daily_update(symbols_filter=args.symbols)
     
+    if args.csv:
+        collector.save_to_csv(collector.load_data())
+    
     # Print summary
     print("\n" + "="*60)
     print("UPDATE SUMMARY")
@@ -0,0 +1,24 @@
+"""
+Running the collectors' async code from their synchronous entry points
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+def run_coroutine(coro):
+    """
+    Run a coroutine to completion and return its result
+
+    Uses asyncio.run when no event loop is running in this thread. Inside a
+    running loop (Jupyter, async applications) asyncio.run would raise, so
+    the coroutine runs on a fresh loop in a worker thread and this call
+    blocks until it finishes.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
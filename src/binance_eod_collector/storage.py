@@ -0,0 +1,122 @@
+"""
+Storage helpers shared by both collectors
+
+Each Parquet store is a hive-partitioned dataset with one directory per
+symbol. Writes only ever add time-ordered files, so a (date, symbol) row
+written later supersedes earlier copies of it. Slow-changing reference
+data is cached next to the store as gzipped JSON.
+"""
+
+import gzip
+import logging
+import os
+import threading
+import time
+from typing import Callable, List, Optional
+
+import orjson
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+
+def cached_json(path, ttl_seconds: float, fetch: Callable):
+    """
+    Return JSON-serialisable data from a gzipped cache file, calling fetch()
+    and refreshing the file when it is missing or older than ttl_seconds
+
+    Args:
+        path: Cache file path (<name>.json.gz)
+        ttl_seconds: Maximum age of a cached entry
+        fetch: Zero-argument callable producing fresh data
+    """
+    try:
+        if time.time() - os.path.getmtime(path) < ttl_seconds:
+            with gzip.open(path, 'rb') as f:
+                return orjson.loads(f.read())
+    except (OSError, ValueError):
+        pass  # Missing or unreadable cache entry, fetch fresh data
+
+    data = fetch()
+
+    if data:
+        # Write atomically so a crash never leaves a truncated entry; the
+        # temp name is per thread so concurrent refreshes don't collide
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, 'wb') as f:
+            f.write(orjson.dumps(data))
+        os.replace(tmp_path, path)
+
+    return data
+
+
+def load_store(path, columns: Optional[List[str]] = None,
+               symbols: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Load a Parquet store, keeping the most recently written row per (date, symbol)
+
+    Args:
+        path: Dataset directory
+        columns: Columns to load in addition to date and symbol (default: all)
+        symbols: Only load these symbols (default: all)
+
+    Returns:
+        DataFrame sorted by symbol and date (empty if the store does not exist)
+    """
+    if not os.path.exists(path):
+        return pd.DataFrame()
+
+    if columns is not None:
+        columns = ['date', 'symbol'] + [c for c in columns if c not in ('date', 'symbol')]
+    filters = [('symbol', 'in', list(symbols))] if symbols else None
+
+    df = pd.read_parquet(path, columns=columns, filters=filters)
+    df = df.drop_duplicates(subset=['date', 'symbol'], keep='last')
+    return df.sort_values(['symbol', 'date'], ignore_index=True)
+
+
+def consolidate_store(path, min_files: int = 2, **write_options):
+    """
+    Compact a Parquet store into one deduplicated file per symbol
+
+    Appends leave many small files and superseded rows behind; this
+    rewrites each symbol partition holding at least min_files files,
+    keeping the most recently written row per date. Partitions are
+    processed one at a time, so memory is bounded by the largest symbol
+    rather than the store.
+
+    Args:
+        path: Dataset directory
+        min_files: Leave partitions with fewer files than this untouched
+        **write_options: Passed to pyarrow.parquet.write_table
+    """
+    if not os.path.exists(path):
+        return
+
+    compacted = 0
+    for entry in os.scandir(path):
+        if not entry.is_dir():
+            continue
+
+        old_files = sorted(f.path for f in os.scandir(entry.path)
+                           if f.name.endswith('.parquet'))
+        if len(old_files) < max(min_files, 2):
+            continue
+
+        # File names are time-ordered, so keep='last' keeps the newest write
+        df = pq.read_table(old_files, partitioning=None).to_pandas()
+        df = df.drop_duplicates(subset='date', keep='last').sort_values('date')
+
+        # Write the compacted file before removing the old ones; if this
+        # is interrupted, load_store still resolves to the same rows
+        new_file = os.path.join(entry.path, f"part-{time.time_ns()}-0.parquet")
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False),
+                       new_file, **write_options)
+        for old_file in old_files:
+            os.remove(old_file)
+        compacted += 1
+
+    if compacted:
+        logger.info(f"Consolidated {compacted} partitions in {path}")
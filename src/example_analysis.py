@@ -11,13 +11,15 @@ from pathlib import Path
 
 def load_data():
     """Load the collected crypto data"""
-    data_file = Path('data/crypto_data.csv')
+    data_file = Path('data/crypto_data.parquet')
     
     if not data_file.exists():
         print("Error: No data file found. Run data collection first.")
         return None
     
-    df = pd.read_csv(data_file)
+    # The store is append-only; the latest write for a (date, symbol) wins
+    df = pd.read_parquet(data_file)
+    df = df.drop_duplicates(subset=['date', 'symbol'], keep='last')
     df['date'] = pd.to_datetime(df['date'])
     
     print("Data loaded successfully!")
@@ -5,14 +5,38 @@ This script demonstrates how to load and prepare the collected data
 for machine learning-based portfolio weight generation.
 """
 
+import os
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
-from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
 
+from binance_eod_collector.storage import load_store
 
-def load_data(data_path: str = "../data/all_pairs_eod.csv") -> pd.DataFrame:
-    """Load the collected Binance EOD data"""
-    df = pd.read_csv(data_path)
+
+# Date x symbol matrices are float32: daily prices and volumes need no more
+# than 7 significant digits, and it halves the memory the features walk.
+# pandas rolling statistics still accumulate in float64.
+MATRIX_DTYPE = np.float32
+
+
+def load_data(data_path: str = "../data/all_pairs_eod.parquet",
+              symbols: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Load the collected Binance EOD data from the collector's Parquet store
+    
+    Rows superseded by later writes are dropped, as in
+    BinanceEODCollector.load_data. Dates load as datetime64 and symbols
+    as a categorical.
+    
+    Args:
+        data_path: Path to the Parquet store
+        symbols: Only load these symbols (default: all)
+    """
+    df = load_store(data_path, symbols=symbols)
+    if df.empty:
+        raise FileNotFoundError(f"No collected data in {data_path}; run collect-data first")
+    
     df['date'] = pd.to_datetime(df['date'])
     return df
 
@@ -30,29 +54,109 @@ def filter_liquid_pairs(df: pd.DataFrame, min_avg_volume: float = 1000000,
     Returns:
         Filtered DataFrame
     """
+    # Work per category and map decisions back to rows through the codes,
+    # so string checks run once per symbol rather than once per row
+    symbols = df['symbol'].astype('category')
+    codes = symbols.cat.codes.to_numpy()
+    categories = symbols.cat.categories
+    
     # Filter for quote currency
     if quote_currency:
-        df = df[df['symbol'].str.endswith(quote_currency)].copy()
+        eligible = np.asarray(categories.str.endswith(quote_currency), dtype=bool)
+    else:
+        eligible = np.ones(len(categories), dtype=bool)
     
-    # Calculate average volume per symbol
-    avg_volumes = df.groupby('symbol')['quote_volume'].mean()
+    # Calculate average volume per symbol with bincount over the codes
+    # rather than a hash groupby on symbol strings (NaNs skipped)
+    volumes = df['quote_volume'].to_numpy(dtype=np.float64)
+    valid = (codes >= 0) & ~np.isnan(volumes)
+    sums = np.bincount(codes[valid], weights=volumes[valid], minlength=len(categories))
+    counts = np.bincount(codes[valid], minlength=len(categories))
     
     # Filter symbols with sufficient volume
-    liquid_symbols = avg_volumes[avg_volumes >= min_avg_volume].index.tolist()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        liquid = eligible & (sums / counts >= min_avg_volume)
+    
+    print(f"Found {liquid.sum()} liquid pairs with avg volume >= ${min_avg_volume:,.0f}")
+    
+    df = df[liquid[codes] & (codes >= 0)]
+    
+    # Categorical symbols make the reshape into matrices work on integer codes;
+    # unused categories are dropped by the reshape, so only convert if needed
+    if not isinstance(df['symbol'].dtype, pd.CategoricalDtype):
+        df = df.astype({'symbol': 'category'})
+    return df
+
+
+def load_liquid_pairs(data_path: str = "../data/all_pairs_eod.parquet",
+                      min_avg_volume: float = 1000000,
+                      quote_currency: str = 'USDT') -> pd.DataFrame:
+    """
+    Load only the liquid pairs, in two passes over the Parquet store
+    
+    Equivalent to filter_liquid_pairs(load_data(data_path), ...), but the
+    full store is never in memory: the first pass reads just the quote
+    volumes to pick the symbols, the second reads only their partitions.
+    
+    Args:
+        data_path: Path to the Parquet store
+        min_avg_volume: Minimum average daily volume in quote currency
+        quote_currency: Quote currency to filter (USDT, BTC, etc.)
+    
+    Returns:
+        Filtered DataFrame
+    """
+    volumes = load_store(data_path, columns=['quote_volume'])
+    if volumes.empty:
+        raise FileNotFoundError(f"No collected data in {data_path}; run collect-data first")
     
-    print(f"Found {len(liquid_symbols)} liquid pairs with avg volume >= ${min_avg_volume:,.0f}")
+    liquid = filter_liquid_pairs(volumes, min_avg_volume, quote_currency)['symbol'].unique()
+    if len(liquid) == 0:
+        return volumes.iloc[:0]
     
-    return df[df['symbol'].isin(liquid_symbols)].copy()
+    return load_data(data_path, symbols=list(liquid))
+
+
+def create_matrices(df: pd.DataFrame,
+                    value_cols: Sequence[str] = ('close', 'quote_volume')) -> Tuple[pd.DataFrame, ...]:
+    """
+    Create date x symbol matrices from a single reshape of the data
+    
+    Args:
+        df: Long-format data with date and symbol columns
+        value_cols: Columns to build a matrix for (default: price and volume)
+    
+    Returns:
+        One matrix per entry of value_cols, in the same order
+    """
+    # Date and symbol category codes are the row and column positions, so
+    # each matrix is filled by one fancy-index scatter
+    dates = df['date'].astype('category')
+    symbols = df['symbol'].astype('category').cat.remove_unused_categories()
+    rows = dates.cat.codes.to_numpy()
+    cols = symbols.cat.codes.to_numpy()
+    present = (rows >= 0) & (cols >= 0)
+    rows, cols = rows[present], cols[present]
+    
+    index = pd.Index(dates.cat.categories, name='date')
+    columns = pd.CategoricalIndex(symbols.cat.categories, dtype=symbols.dtype, name='symbol')
+    
+    matrices = []
+    for value_col in value_cols:
+        matrix = np.full((len(index), len(columns)), np.nan, dtype=MATRIX_DTYPE)
+        matrix[rows, cols] = df[value_col].to_numpy()[present]
+        matrices.append(pd.DataFrame(matrix, index=index, columns=columns))
+    return tuple(matrices)
 
 
 def create_price_matrix(df: pd.DataFrame) -> pd.DataFrame:
     """Create price matrix with dates as rows and symbols as columns"""
-    return df.pivot(index='date', columns='symbol', values='close')
+    return create_matrices(df, value_cols=['close'])[0]
 
 
 def create_volume_matrix(df: pd.DataFrame) -> pd.DataFrame:
     """Create volume matrix"""
-    return df.pivot(index='date', columns='symbol', values='quote_volume')
+    return create_matrices(df, value_cols=['quote_volume'])[0]
 
 
 def calculate_returns(price_df: pd.DataFrame, periods: int = 1) -> pd.DataFrame:
@@ -75,23 +179,141 @@ def calculate_momentum(price_df: pd.DataFrame, window: int = 14) -> pd.DataFrame
     return (price_df - price_df.shift(window)) / price_df.shift(window)
 
 
+def _wilder_average(x: np.ndarray, window: int) -> np.ndarray:
+    """
+    Wilder's smoothed average down each column of x
+    
+    Each column is seeded with the mean of its first `window` non-NaN values
+    and then updated as avg = (avg * (window - 1) + value) / window. NaN
+    values (before listing, gaps) leave the average unchanged and are NaN
+    in the output.
+    """
+    out = np.full(x.shape, np.nan)
+    avg = np.zeros(x.shape[1])
+    seen = np.zeros(x.shape[1], dtype=np.int64)
+    
+    # One vectorised step per row across all symbols
+    for t, row in enumerate(x):
+        valid = ~np.isnan(row)
+        seen += valid
+        seeding = valid & (seen <= window)
+        avg[seeding] += row[seeding] / window
+        updating = valid & (seen > window)
+        avg[updating] = (avg[updating] * (window - 1) + row[updating]) / window
+        ready = valid & (seen >= window)
+        out[t, ready] = avg[ready]
+    return out
+
+
+def _wilder_rsi(delta: np.ndarray, index: pd.Index, columns: pd.Index,
+                window: int) -> pd.DataFrame:
+    """RSI from price deltas, smoothing gains and losses with Wilder's average"""
+    delta = np.asarray(delta, dtype=np.float64)
+    avg_gain = _wilder_average(np.clip(delta, 0, None), window)
+    avg_loss = _wilder_average(np.clip(-delta, 0, None), window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+    return pd.DataFrame(rsi, index=index, columns=columns)
+
+
 def calculate_rsi(price_df: pd.DataFrame, window: int = 14) -> pd.DataFrame:
-    """Calculate Relative Strength Index"""
-    delta = price_df.diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
-    rs = gain / loss
-    return 100 - (100 / (1 + rs))
+    """Calculate Relative Strength Index (Wilder's smoothing)"""
+    delta = np.diff(price_df.to_numpy(), axis=0, prepend=np.nan)
+    return _wilder_rsi(delta, price_df.index, price_df.columns, window)
 
 
 def calculate_sharpe_ratio(returns_df: pd.DataFrame, window: int = 30, 
                           risk_free_rate: float = 0.0) -> pd.DataFrame:
     """Calculate rolling Sharpe ratio"""
-    mean_return = returns_df.rolling(window=window).mean()
-    std_return = returns_df.rolling(window=window).std()
+    rolling = returns_df.rolling(window=window)
+    mean_return = rolling.mean()
+    std_return = rolling.std()
     return (mean_return - risk_free_rate / 252) / std_return
 
 
+def _lagged(arr: np.ndarray, periods: int) -> np.ndarray:
+    """Return arr shifted down by periods rows, padding the top with NaN"""
+    out = np.full_like(arr, np.nan)
+    if periods < len(arr):
+        out[periods:] = arr[:len(arr) - periods]
+    return out
+
+
+def compute_features(price_df: pd.DataFrame, momentum_window: int = 14,
+                     volatility_window: int = 30, rsi_window: int = 14,
+                     risk_free_rate: float = 0.0) -> Dict[str, pd.DataFrame]:
+    """
+    Calculate all per-symbol features from one pass over the price array
+    
+    Equivalent to calling calculate_returns, calculate_log_returns,
+    calculate_momentum, calculate_volatility, calculate_rsi and
+    calculate_sharpe_ratio separately, but shares the price ratio, the
+    price deltas and the rolling window over returns between them.
+    
+    Returns:
+        Dict of DataFrames keyed by 'returns', 'log_returns', 'momentum',
+        'volatility', 'rsi' and 'sharpe'
+    """
+    prices = price_df.to_numpy()
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        prev = _lagged(prices, 1)
+        ratio = prices / prev
+        returns = ratio - 1
+        log_returns = np.log(ratio)
+        
+        lagged = _lagged(prices, momentum_window)
+        momentum = (prices - lagged) / lagged
+        
+        delta = prices - prev
+    
+    def frame(arr):
+        return pd.DataFrame(arr, index=price_df.index, columns=price_df.columns)
+    
+    rolling_returns = frame(returns).rolling(window=volatility_window)
+    volatility = rolling_returns.std()
+    
+    return {
+        'returns': frame(returns),
+        'log_returns': frame(log_returns),
+        'momentum': frame(momentum),
+        'volatility': volatility,
+        'rsi': _wilder_rsi(delta, price_df.index, price_df.columns, rsi_window),
+        'sharpe': (rolling_returns.mean() - risk_free_rate / 252) / volatility,
+    }
+
+
+def parallel_apply(fn: Callable, df: pd.DataFrame, n_jobs: Optional[int] = None,
+                   **kwargs) -> Union[pd.DataFrame, Dict[str, pd.DataFrame]]:
+    """
+    Apply a per-symbol feature function to column chunks on a thread pool
+    
+    Features never mix symbols, so the matrix can be split by columns. The
+    pandas rolling kernels and numpy ufuncs release the GIL, so threads run
+    the chunks in parallel without copying data to other processes.
+    
+    Args:
+        fn: Function taking a date x symbol DataFrame (e.g. compute_features)
+        df: Date x symbol matrix
+        n_jobs: Number of threads (default: CPU count)
+        **kwargs: Passed through to fn
+    
+    Returns:
+        fn's result for the whole matrix: a DataFrame, or a dict of DataFrames
+    """
+    n_chunks = min(n_jobs or os.cpu_count() or 1, df.shape[1])
+    if n_chunks <= 1:
+        return fn(df, **kwargs)
+    
+    chunks = np.array_split(np.arange(df.shape[1]), n_chunks)
+    with ThreadPoolExecutor(max_workers=n_chunks) as executor:
+        parts = list(executor.map(lambda cols: fn(df.iloc[:, cols], **kwargs), chunks))
+    
+    if isinstance(parts[0], dict):
+        return {key: pd.concat([part[key] for part in parts], axis=1) for key in parts[0]}
+    return pd.concat(parts, axis=1)
+
+
 def generate_simple_weights(price_df: pd.DataFrame, volume_df: pd.DataFrame,
                            momentum_window: int = 14, 
                            volatility_window: int = 30) -> pd.Series:
@@ -107,32 +329,54 @@ def generate_simple_weights(price_df: pd.DataFrame, volume_df: pd.DataFrame,
     Returns:
         Series with portfolio weights (long/short)
     """
-    # Calculate features
-    returns = calculate_returns(price_df)
-    momentum = calculate_momentum(price_df, window=momentum_window)
-    volatility = calculate_volatility(returns, window=volatility_window)
-    
-    # Get latest values
-    latest_momentum = momentum.iloc[-1]
-    latest_volatility = volatility.iloc[-1]
-    latest_volume = volume_df.iloc[-1]
-    
-    # Normalize momentum
-    momentum_z = (latest_momentum - latest_momentum.mean()) / latest_momentum.std()
+    # Only the latest momentum and volatility are used, so work on the last
+    # rows of the price matrix instead of computing full feature matrices
+    window = max(momentum_window, volatility_window) + 1
+    prices = price_df.to_numpy(dtype=np.float64)[-window:]
+    if len(prices) < window:
+        prices = np.vstack([np.full((window - len(prices), prices.shape[1]), np.nan), prices])
     
-    # Calculate raw weights: momentum / volatility, weighted by volume
-    raw_weights = momentum_z / latest_volatility
+    volumes = volume_df.iloc[-1].reindex(price_df.columns).to_numpy(dtype=np.float64)
     
-    # Apply volume filter (only trade liquid assets)
-    volume_threshold = latest_volume.quantile(0.3)
-    raw_weights = raw_weights.where(latest_volume >= volume_threshold, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        base = prices[-1 - momentum_window]
+        returns = prices[1:] / prices[:-1] - 1
+        momentum = (prices[-1] - base) / base
+        volatility = returns[-volatility_window:].std(axis=0, ddof=1)
+        
+        # Normalize momentum (NaN-skipping, sample std like pandas)
+        valid_momentum = momentum[~np.isnan(momentum)]
+        if valid_momentum.size > 1:
+            momentum_z = (momentum - valid_momentum.mean()) / valid_momentum.std(ddof=1)
+        else:
+            momentum_z = np.full_like(momentum, np.nan)
+        
+        # Calculate raw weights: momentum / volatility, weighted by volume
+        raw_weights = momentum_z / volatility
+        
+        # Apply volume filter (only trade liquid assets)
+        valid_volumes = volumes[~np.isnan(volumes)]
+        volume_threshold = np.quantile(valid_volumes, 0.3) if valid_volumes.size else np.nan
+        raw_weights = np.where(volumes >= volume_threshold, raw_weights, 0)
+        
+        # Normalize to sum to 0 (market neutral) or scale for long-short
+        weights = raw_weights / np.nansum(np.abs(raw_weights))
     
-    # Normalize to sum to 0 (market neutral) or scale for long-short
-    weights = raw_weights / raw_weights.abs().sum()
+    weights = pd.Series(weights, index=price_df.columns)
     
     return weights
 
 
+def top_weights(weights: pd.Series, n: int = 10, largest: bool = True) -> pd.Series:
+    """Return the n largest (or smallest) weights in order without a full sort"""
+    keys = -weights.to_numpy() if largest else weights.to_numpy()
+    if len(keys) > n:
+        idx = np.argpartition(keys, n - 1)[:n]
+    else:
+        idx = np.arange(len(keys))
+    return weights.iloc[idx[np.argsort(keys[idx])]]
+
+
 def main():
     """Main example function"""
     
@@ -140,37 +384,33 @@ def main():
     print("BINANCE EOD DATA - ML PREPROCESSING EXAMPLE")
     print("=" * 70)
     
-    # Load data
-    print("\n1. Loading data...")
-    df = load_data()
-    
-    print(f"   Total records: {len(df):,}")
-    print(f"   Date range: {df['date'].min()} to {df['date'].max()}")
-    print(f"   Unique symbols: {df['symbol'].nunique()}")
-    
-    # Filter for liquid USDT pairs
-    print("\n2. Filtering for liquid USDT pairs...")
-    df_filtered = filter_liquid_pairs(df, min_avg_volume=1_000_000, quote_currency='USDT')
+    # Load only the liquid USDT pairs: their quote volumes are read first,
+    # then the full rows of the symbols that pass
+    print("\n1. Loading liquid USDT pairs...")
+    df_filtered = load_liquid_pairs(min_avg_volume=1_000_000, quote_currency='USDT')
     
-    print(f"   Remaining symbols: {df_filtered['symbol'].nunique()}")
+    print(f"   Total records: {len(df_filtered):,}")
+    print(f"   Date range: {df_filtered['date'].min()} to {df_filtered['date'].max()}")
+    print(f"   Unique symbols: {df_filtered['symbol'].nunique()}")
     
     # Create matrices
-    print("\n3. Creating price and volume matrices...")
-    price_matrix = create_price_matrix(df_filtered)
-    volume_matrix = create_volume_matrix(df_filtered)
+    print("\n2. Creating price and volume matrices...")
+    price_matrix, volume_matrix = create_matrices(df_filtered)
     
     print(f"   Price matrix shape: {price_matrix.shape}")
     print(f"   Date range: {price_matrix.index.min()} to {price_matrix.index.max()}")
     
     # Calculate features
-    print("\n4. Calculating features...")
-    returns_1d = calculate_returns(price_matrix, periods=1)
+    print("\n3. Calculating features...")
+    features = parallel_apply(compute_features, price_matrix, momentum_window=14,
+                              volatility_window=30, rsi_window=14)
+    returns_1d = features['returns']
     returns_7d = calculate_returns(price_matrix, periods=7)
-    log_returns = calculate_log_returns(price_matrix, periods=1)
-    volatility = calculate_volatility(returns_1d, window=30)
-    momentum = calculate_momentum(price_matrix, window=14)
-    rsi = calculate_rsi(price_matrix, window=14)
-    sharpe = calculate_sharpe_ratio(returns_1d, window=30)
+    log_returns = features['log_returns']
+    volatility = features['volatility']
+    momentum = features['momentum']
+    rsi = features['rsi']
+    sharpe = features['sharpe']
     
     print(f"   ✓ Returns (1-day, 7-day)")
     print(f"   ✓ Log returns")
@@ -180,7 +420,7 @@ def main():
     print(f"   ✓ Sharpe Ratio (30-day)")
     
     # Generate weights
-    print("\n5. Generating portfolio weights...")
+    print("\n4. Generating portfolio weights...")
     weights = generate_simple_weights(price_matrix, volume_matrix)
     
     # Display results
@@ -189,13 +429,13 @@ def main():
     print("=" * 70)
     
     # Top 10 long positions
-    long_weights = weights[weights > 0].sort_values(ascending=False).head(10)
+    long_weights = top_weights(weights[weights > 0], 10)
     print("\nLONG Positions:")
     for symbol, weight in long_weights.items():
         print(f"  {symbol:15s}: {weight:+.4f} ({weight*100:+.2f}%)")
     
     # Top 10 short positions
-    short_weights = weights[weights < 0].sort_values().head(10)
+    short_weights = top_weights(weights[weights < 0], 10, largest=False)
     print("\nSHORT Positions:")
     for symbol, weight in short_weights.items():
         print(f"  {symbol:15s}: {weight:+.4f} ({weight*100:+.2f}%)")
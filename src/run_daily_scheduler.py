@@ -61,11 +61,15 @@ def main():
         logger.info("Running update immediately (--now flag detected)")
         daily_update()
     
-    # Keep running
+    # Keep running, sleeping until the next scheduled job is due
     try:
         while True:
+            idle = schedule.idle_seconds()
+            if idle is None:
+                break  # no jobs left
+            if idle > 0:
+                time.sleep(idle)
             schedule.run_pending()
-            time.sleep(60)  # Check every minute
     except KeyboardInterrupt:
         logger.info("Scheduler stopped by user")
 
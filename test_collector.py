@@ -3,13 +3,17 @@ Test script to verify the crypto collector works correctly
 """
 
 from binance_eod_collector.crypto_collector_v2 import CryptoDataCollector
+import asyncio
+import aiohttp
 import sys
 
+_BANNER = "=" * 60
+
 def test_collector():
     """Run basic tests"""
-    print("=" * 60)
+    print(_BANNER)
     print("Testing Crypto Data Collector")
-    print("=" * 60)
+    print(_BANNER)
     
     # Test initialization
     print("\n1. Initializing collector...")
@@ -56,7 +60,11 @@ def test_collector():
     # Test historical data fetch
     print("\n5. Testing historical data fetch (7 days)...")
     try:
-        df = collector.get_historical_data('bitcoin', days=7)
+        async def fetch():
+            async with aiohttp.ClientSession() as session:
+                return await collector.get_historical_data(session, 'bitcoin', days=7)
+        
+        df = asyncio.run(fetch())
         if not df.empty:
             print(f"   ✓ Fetched {len(df)} days of data")
             print(f"   Columns: {list(df.columns)}")
@@ -73,12 +81,12 @@ def test_collector():
         print(f"   ✗ Failed: {e}")
         return False
     
-    print("\n" + "=" * 60)
+    print("\n" + _BANNER)
     print("✓ All tests passed!")
-    print("=" * 60)
+    print(_BANNER)
     print("\nYou can now run:")
     print("  python crypto_collector_v2.py historical")
-    print("=" * 60)
+    print(_BANNER)
     return True
 
 if __name__ == '__main__':